@@ -3,7 +3,7 @@ Guardium CM Processor — Complete Health Check
 ===================================================
 
 This script automates the Guardium Health Check, processing logs and generating detailed 
-reports in Word and Excel formats.
+reports in Word and tabular (Parquet/CSV/Excel) formats.
 
 Expected Repository Structure:
 /
@@ -25,22 +25,42 @@ Expected Repository Structure:
     - Reports in Word: Collector - Failure - Date
 
 Dependencies:
-    pip install pandas openpyxl python-docx
+    pip install pandas openpyxl python-docx xlsxwriter pyarrow
+    pip install python-calamine   (optional, much faster .xlsx parsing)
 """
 
-import sys
+import argparse
+import hashlib
+import os
+import pickle
+import re
+import warnings
+from copy import deepcopy
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 from datetime import datetime
 import pandas as pd
 
 try:
-    from docx import Document
-    from docx.shared import Pt
-    from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-except Exception:
-    # This check ensures the script runs even if docx is not installed, 
-    # but print a warning if report generation is attempted.
-    Document = None
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:
+    # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+try:
+    # Rust-backed Excel parser; pandas falls back to openpyxl/xlrd without it
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = "calamine"
+except ImportError:
+    EXCEL_ENGINE = None
+
+try:
+    # Faster content hashing for the parse cache; hashlib.blake2b otherwise
+    from blake3 import blake3 as _content_hasher
+except ImportError:
+    _content_hasher = hashlib.blake2b
 
 # =========================================================
 # CONFIGURATION
@@ -52,6 +72,7 @@ FOLDER_STAP = "STAP status"
 FOLDER_AGGREGATION = "Aggregation Processes"
 FOLDER_QUALITY = "Collection Quality"
 FOLDER_OUTPUT = "output"
+FOLDER_CACHE = ".cache"
 
 BASE_SUBFOLDERS = [
     FOLDER_CM,
@@ -64,43 +85,272 @@ ACTIVE_KEYWORDS = ("active", "up", "running", "connected", "online")
 INACTIVE_KEYWORDS = ("inactive", "down", "stopped", "disconnected", "offline", "failed", "error")
 SUCCESS_KEYWORDS = ("success", "done", "completed", "ok")
 
+def _keyword_re(keywords):
+    """Case-insensitive alternation anchored at a word start ("inactive" does not match "active")"""
+    return re.compile(r"(?i)\b(?:" + "|".join(map(re.escape, keywords)) + ")")
+
+# Keyword alternations compiled once so pandas can match a whole column in one pass
+ACTIVE_RE = _keyword_re(ACTIVE_KEYWORDS)
+SUCCESS_RE = _keyword_re(SUCCESS_KEYWORDS)
+
+# Column header keywords searched in each input file (first matching column wins)
+STAP_COLUMNS = {
+    "status": ["status"],
+    "host": ["software stap host", "stap host", "host"],
+    "version": ["revision", "version", "s-tap revision", "stap revision"],
+}
+AGGREGATION_COLUMNS = {
+    "activity": ["activity type", "activity", "process"],
+    "status": ["status", "execution status"],
+    "date": ["start time", "run time", "timestamp", "date"],
+}
+
+# Formats available for the tabular (inventory/errors) output
+OUTPUT_FORMATS = ("parquet", "csv", "xlsx")
+TABLE_STAP = "STAP_Inventory"
+TABLE_AGGREGATION = "Aggregation_Errors"
+EXCEL_REPORT = "CM_report.xlsx"
+
+# Bump whenever the per-file parsing logic changes so stale cache entries are ignored
+CACHE_VERSION = 3
+
+# How aggregation failure dates are shown in the Word/CSV/Excel outputs
+DATE_FORMAT = "%Y-%m-%d %H:%M"
+
+# Reads ambiguous dates like 01/02/2024 as dd/mm (the report itself uses %d/%m/%Y);
+# --month-first switches to mm/dd. Year-first (ISO) dates are unaffected.
+DATE_DAYFIRST = True
+
+# Parsed tables kept in memory by read_table (header sniffs count as entries too)
+TABLE_CACHE_MAX_ENTRIES = 32
+
+# Below this many files, process start-up costs more than parallel parsing saves
+PARALLEL_MIN_FILES = 4
+
 # =========================================================
 # HELPER FUNCTIONS
 # =========================================================
 
-def read_table(path: Path) -> pd.DataFrame:
+# Parsed tables keyed by (path, mtime_ns, size) so unchanged files are not re-parsed.
+# Least-recently-used entries are evicted past TABLE_CACHE_MAX_ENTRIES.
+_TABLE_CACHE = OrderedDict()
+_TABLE_CACHE_ENABLED = True
+
+def _disable_table_cache():
+    """Pool initializer: worker processes are short-lived, so caching there only costs memory"""
+    global _TABLE_CACHE_ENABLED
+    _TABLE_CACHE_ENABLED = False
+
+class TableReadError(Exception):
+    """A file could not be read (locked, corrupt, ...), as opposed to having no data"""
+
+def read_table(path: Path, usecols=None, dtype=None, nrows=None, strict=False) -> pd.DataFrame:
+    """
+    Reads a csv/xls/xlsx file; usecols, dtype and nrows are forwarded to pandas.
+    Read errors are printed and give an empty frame, or raise TableReadError
+    when strict=True so callers can tell them apart from an empty file.
+    """
+    try:
+        st = path.stat()
+    except OSError as e:
+        print(f"⚠ Error reading {path.name}: {e}")
+        if strict:
+            raise TableReadError(path) from e
+        return pd.DataFrame()
+
+    if usecols is not None:
+        usecols = list(usecols)
+    key = (
+        str(path), st.st_mtime_ns, st.st_size,
+        tuple(usecols) if usecols is not None else None, dtype, nrows,
+    )
+    cached = _TABLE_CACHE.get(key)
+    if cached is not None:
+        _TABLE_CACHE.move_to_end(key)
+        # Shallow copy so callers can add/replace columns without touching the cache
+        return cached.copy(deep=False)
+
+    df = None
     try:
         if path.suffix.lower() in (".xls", ".xlsx"):
-            return pd.read_excel(path)
-        if path.suffix.lower() == ".csv":
-            return pd.read_csv(path)
+            df = pd.read_excel(path, engine=EXCEL_ENGINE, usecols=usecols, dtype=dtype, nrows=nrows)
+        elif path.suffix.lower() == ".csv":
+            df = pd.read_csv(path, usecols=usecols, dtype=dtype, nrows=nrows)
     except Exception as e:
         print(f"⚠ Error reading {path.name}: {e}")
-    return pd.DataFrame()
-
-def find_column(df, keywords):
-    """Finds a column based on keywords (case insensitive)"""
-    for c in df.columns:
-        c_str = str(c).lower()
-        for k in keywords:
-            if k in c_str:
-                return c
+        if strict:
+            raise TableReadError(path) from e
+
+    if df is None:
+        return pd.DataFrame()
+
+    if not _TABLE_CACHE_ENABLED:
+        return df
+
+    _TABLE_CACHE[key] = df
+    while len(_TABLE_CACHE) > TABLE_CACHE_MAX_ENTRIES:
+        _TABLE_CACHE.popitem(last=False)
+    return df.copy(deep=False)
+
+read_table.cache_clear = _TABLE_CACHE.clear
+
+def _lc_pairs(columns):
+    """Lowercased column names paired with the originals, in column order"""
+    return [(str(c).lower(), c) for c in columns]
+
+def find_column(df, keywords, lc_pairs=None):
+    """
+    Finds a column based on keywords (case insensitive). Pass lc_pairs from
+    _lc_pairs(df.columns) when looking up several keyword groups on one frame.
+    """
+    if lc_pairs is None:
+        lc_pairs = _lc_pairs(df.columns)
+    for lc, orig in lc_pairs:
+        if any(k in lc for k in keywords):
+            return orig
     return None
 
-def clean_folder_contents(folder: Path, recursive=False):
+# Resolved column mappings keyed by (keyword spec, header columns)
+_SCHEMA_CACHE = {}
+
+def read_columns(path: Path, column_keywords: dict, strict=False) -> tuple:
+    """
+    Sniffs the header of a file, resolves each entry of column_keywords with
+    find_column and re-reads only the matched columns as text.
+    Returns (df, {name: column or None}).
+    """
+    header = read_table(path, nrows=0, strict=strict)
+
+    # Files from the same Guardium export share a header, so resolve it only once
+    key = (
+        tuple((name, tuple(kws)) for name, kws in column_keywords.items()),
+        tuple(header.columns),
+    )
+    cols = _SCHEMA_CACHE.get(key)
+    if cols is None:
+        lc_pairs = _lc_pairs(header.columns)
+        cols = {name: find_column(header, kws, lc_pairs) for name, kws in column_keywords.items()}
+        _SCHEMA_CACHE[key] = cols
+
+    wanted = list(dict.fromkeys(c for c in cols.values() if c is not None))
+    if not wanted:
+        return pd.DataFrame(), cols
+    return read_table(path, usecols=wanted, dtype=str, strict=strict), cols
+
+def clean_folder_contents(folder, recursive=False):
     """Cleans files from previous runs to ensure fresh data"""
-    if not folder.is_dir():
+    try:
+        entries = list(os.scandir(folder))
+    except OSError:
         return
-    
-    for item in folder.iterdir():
-        if item.is_file():
-            try:
-                item.unlink()
-            except Exception:
-                pass
-        elif recursive and item.is_dir():
-            # Only clean children recursively, not the child folders themselves
-            clean_folder_contents(item, recursive=False)
+
+    for entry in entries:
+        # DirEntry caches the file type, so only symlinks cost an extra stat()
+        try:
+            if entry.is_file():
+                os.unlink(entry.path)
+            elif recursive and entry.is_dir(follow_symlinks=False):
+                # Only clean children recursively, not the child folders themselves
+                clean_folder_contents(entry.path, recursive=False)
+        except OSError:
+            continue
+
+def map_files(func, *iterables):
+    """
+    Applies func over the per-file arguments, using a process pool when there
+    are enough files to make it worthwhile. Results keep the input order.
+    """
+    args = list(zip(*iterables))
+    if len(args) < PARALLEL_MIN_FILES:
+        return [func(*a) for a in args]
+    workers = min(len(args), os.cpu_count() or 1)
+    # ~4 chunks per worker keeps all processes busy without per-file IPC overhead
+    chunksize = max(1, len(args) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_disable_table_cache) as ex:
+        return list(ex.map(func, *zip(*args), chunksize=chunksize))
+
+def _file_digest(path: Path):
+    h = _content_hasher()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _cache_config():
+    """
+    The configuration baked into cached results (classification keywords and
+    column specs). Entries saved under a different configuration are ignored.
+    """
+    return (ACTIVE_RE.pattern, SUCCESS_RE.pattern, repr(STAP_COLUMNS), repr(AGGREGATION_COLUMNS))
+
+def _parse_or_none(parse, *args):
+    try:
+        return parse(*args)
+    except TableReadError:
+        return None
+
+def cached_parse(cache_dir, parse, *args):
+    """
+    Calls parse(*args), where the last argument is the file being parsed, and
+    keeps the result in cache_dir across runs. An entry is reused when the
+    file's (mtime, size) is unchanged or, failing that, its content hash is,
+    and only if it was saved under the current keyword/column configuration.
+    cache_dir=None disables the cache. A file that fails to read (TableReadError)
+    yields None and is never cached, so it is retried on the next run.
+    """
+    if cache_dir is None:
+        return _parse_or_none(parse, *args)
+
+    file = args[-1]
+    slot_key = f"{parse.__name__}:{args!r}".encode()
+    slot = Path(cache_dir) / (hashlib.blake2b(slot_key, digest_size=8).hexdigest() + ".pkl")
+
+    try:
+        st = file.stat()
+    except OSError:
+        return _parse_or_none(parse, *args)
+
+    entry = None
+    try:
+        with open(slot, "rb") as f:
+            entry = pickle.load(f)
+        if entry.get("version") != CACHE_VERSION or entry.get("config") != _cache_config():
+            entry = None
+    except Exception:
+        entry = None
+
+    if entry and (entry["mtime_ns"], entry["size"]) == (st.st_mtime_ns, st.st_size):
+        return entry["result"]
+
+    try:
+        digest = _file_digest(file)
+    except OSError as e:
+        print(f"⚠ Error reading {file.name}: {e}")
+        return None
+
+    if entry and entry["digest"] == digest:
+        result = entry["result"]
+    else:
+        try:
+            result = parse(*args)
+        except TableReadError:
+            return None
+
+    try:
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        with open(slot, "wb") as f:
+            pickle.dump({
+                "version": CACHE_VERSION,
+                "config": _cache_config(),
+                "mtime_ns": st.st_mtime_ns,
+                "size": st.st_size,
+                "digest": digest,
+                "result": result,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError as e:
+        print(f"⚠ Could not write cache for {file.name}: {e}")
+
+    return result
 
 # =========================================================
 # LOGIC: COLLECTOR IDENTIFICATION
@@ -110,65 +360,74 @@ def extract_collectors(cm_folder: Path):
     collectors = set()
     for file in cm_folder.iterdir():
         if not file.is_file(): continue
-        df = read_table(file)
+        df, cols = read_columns(file, {
+            "unit_name": ["unit name"],
+            "unit_type": ["unit type"],
+        })
         if df.empty: continue
 
-        unit_name_col = find_column(df, ["unit name"])
-        unit_type_col = find_column(df, ["unit type"])
+        unit_name_col = cols["unit_name"]
+        unit_type_col = cols["unit_type"]
 
         if not unit_name_col or not unit_type_col: continue
 
-        for _, row in df.iterrows():
-            unit_type = str(row.get(unit_type_col, "")).lower()
-            unit_name = str(row.get(unit_name_col, "")).strip()
-            if "collector" in unit_type and unit_name:
-                collectors.add(unit_name)
+        # Vectorized filter: keep only rows whose unit type mentions "collector"
+        mask = df[unit_type_col].astype(str).str.lower().str.contains("collector", na=False, regex=False)
+        names = df.loc[mask, unit_name_col].dropna().astype(str).str.strip()
+        collectors.update(n for n in names if n)
     return sorted(collectors)
 
 # =========================================================
 # LOGIC: STAP STATUS (WITH VERSION & INACTIVE FILTER)
 # =========================================================
 
-def process_stap_status(folder: Path):
-    records = []
-    for file in folder.iterdir():
-        if not file.is_file(): continue
-        df = read_table(file)
-        if df.empty: continue
+def _parse_stap_file(file: Path):
+    """Returns the STAP rows of one file as host/status/version/is_active, or None"""
+    df, cols = read_columns(file, STAP_COLUMNS, strict=True)
+    if df.empty: return None
 
-        status_col = find_column(df, ["status"])
-        host_col = find_column(df, ["software stap host", "stap host", "host"])
-        ver_col = find_column(df, ["revision", "version", "s-tap revision", "stap revision"])
-
-        if not status_col: continue
-
-        for _, row in df.iterrows():
-            status = str(row.get(status_col, "")).strip()
-            host = str(row.get(host_col, "")).strip() if host_col else "N/A"
-            version = str(row.get(ver_col, "")).strip() if ver_col else "Undef."
-            
-            if status:
-                is_active = False
-                status_lower = status.lower()
-                if any(k in status_lower for k in ACTIVE_KEYWORDS):
-                    is_active = True
-                
-                records.append({
-                    "host": host,
-                    "status": status,
-                    "version": version,
-                    "is_active": is_active
-                })
-
-    if not records:
-        return pd.DataFrame(), {"active": 0, "inactive": 0, "total": 0}
-
-    df_all = pd.DataFrame(records)
-    
-    active_count = df_all[df_all["is_active"] == True].shape[0]
-    inactive_count = df_all[df_all["is_active"] == False].shape[0]
+    status_col = cols["status"]
+    host_col = cols["host"]
+    ver_col = cols["version"]
+
+    if not status_col: return None
+
+    sub = pd.DataFrame({
+        "host": df[host_col] if host_col else "N/A",
+        "status": df[status_col],
+        "version": df[ver_col] if ver_col else "Undef.",
+    }, index=df.index)
+    sub["host"] = sub["host"].fillna("N/A").astype(str).str.strip()
+    sub["version"] = sub["version"].fillna("Undef.").astype(str).str.strip()
+    sub["status"] = sub["status"].fillna("").astype(str).str.strip()
 
-    return df_all, {
+    sub = sub[sub["status"] != ""]
+    return sub.assign(is_active=sub["status"].str.contains(ACTIVE_RE, na=False))
+
+def process_stap_status(folder: Path, cache_dir=None):
+    """
+    Returns (all agents, inactive agents, summary counts). The inactive split
+    is done once here so the report does not have to re-filter the inventory.
+    """
+    files = [f for f in folder.iterdir() if f.is_file()]
+    records_frames = [
+        sub for sub in map_files(partial(cached_parse, cache_dir, _parse_stap_file), files)
+        if sub is not None
+    ]
+
+    if not records_frames:
+        return pd.DataFrame(), pd.DataFrame(), {"active": 0, "inactive": 0, "total": 0}
+
+    df_all = pd.concat(records_frames, ignore_index=True)
+    # Status and version repeat heavily across agents; categories store each value once
+    df_all = df_all.astype({"status": "category", "version": "category"})
+
+    is_active = df_all["is_active"].to_numpy(dtype=bool)
+    active_count = int(is_active.sum())
+    inactive_count = len(df_all) - active_count
+    df_inactive = df_all[~is_active]
+
+    return df_all, df_inactive, {
         "active": active_count,
         "inactive": inactive_count,
         "total": len(df_all)
@@ -178,62 +437,291 @@ def process_stap_status(folder: Path):
 # LOGIC: AGGREGATION (WITH DATE)
 # =========================================================
 
-def analyze_aggregation_errors(base_folder: Path, collectors: list):
+_YEAR_FIRST_RE = re.compile(r"^\d{4}[-/.]")
+
+def _to_naive_datetime(values: pd.Series, **kwargs) -> pd.Series:
+    """pd.to_datetime as naive UTC datetime64[ns]; anything that still fails becomes NaT"""
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            parsed = pd.to_datetime(values, errors="coerce", utc=True, cache=True, **kwargs)
+        return parsed.dt.tz_localize(None).astype("datetime64[ns]")
+    except (ValueError, TypeError, OverflowError):
+        return pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+
+def parse_dates(texts: pd.Series, dayfirst=DATE_DAYFIRST) -> pd.Series:
     """
-    Returns a list of dictionaries with found errors:
-    [{'collector': X, 'activity': Y, 'status': Z, 'date': D}, ...]
+    Parses one file's date strings. A single format is inferred from the first
+    value so every row of an export is read the same way; year-first values
+    are always year-month-day and dayfirst only decides dd/mm vs mm/dd.
+    Values the inferred format misses are retried one by one, anything still
+    unparseable (or empty) is NaT. Timestamps with a Z/UTC offset are
+    converted to UTC so every result is naive and comparable.
     """
-    issues = []
-
-    for collector in collectors:
-        collector_path = base_folder / collector
-        if not collector_path.exists():
+    dates = pd.Series(pd.NaT, index=texts.index, dtype="datetime64[ns]")
+    filled = texts[texts != ""]
+    if filled.empty:
+        return dates
+
+    year_first = filled.str.match(_YEAR_FIRST_RE).to_numpy(dtype=bool)
+    for group, group_dayfirst in ((filled[year_first], False), (filled[~year_first], dayfirst)):
+        if group.empty:
             continue
+        with warnings.catch_warnings():
+            # pandas warns when e.g. 12/25/2024 can only be month-first despite dayfirst=True
+            warnings.simplefilter("ignore", UserWarning)
+            fmt = guess_datetime_format(group.iloc[0], dayfirst=group_dayfirst)
+        if fmt:
+            parsed = _to_naive_datetime(group, format=fmt)
+        else:
+            parsed = pd.Series(pd.NaT, index=group.index, dtype="datetime64[ns]")
+        missed = parsed.isna().to_numpy()
+        if missed.any():
+            parsed[missed] = _to_naive_datetime(group[missed], format="mixed", dayfirst=group_dayfirst)
+        dates[group.index] = parsed
+    return dates
+
+def _parse_agg_file(collector: str, dayfirst: bool, file: Path):
+    """Returns the failed aggregation rows of one collector file, or None"""
+    df, cols = read_columns(file, AGGREGATION_COLUMNS, strict=True)
+    if df.empty: return None
+
+    act_col = cols["activity"]
+    status_col = cols["status"]
+    date_col = cols["date"]
+
+    if not act_col or not status_col:
+        return None
+
+    sub = pd.DataFrame({
+        "activity": df[act_col],
+        "status": df[status_col],
+        "date": df[date_col] if date_col else "",
+    }, index=df.index).fillna("").astype(str)
+    for col in sub.columns:
+        sub[col] = sub[col].str.strip()
+
+    sub = sub[(sub["activity"] != "") & (sub["status"] != "")]
+
+    # Anything whose status has no SUCCESS keyword is a failure
+    mask = ~sub["status"].str.contains(SUCCESS_RE, na=False)
+    failures = sub.loc[mask]
+    # Parsed once here so issues sort chronologically; the original text is
+    # kept for the reports when a value cannot be parsed
+    return failures.assign(
+        date=parse_dates(failures["date"], dayfirst),
+        date_text=failures["date"],
+        collector=collector,
+    )
+
+def analyze_aggregation_errors(base_folder: Path, collectors: list, cache_dir=None, dayfirst=DATE_DAYFIRST):
+    """
+    Returns a DataFrame with the found errors, one row per failure:
+    columns collector, activity, status, date (datetime, NaT when missing or
+    unparseable) and date_text (the date as written in the source file)
+    """
+    jobs = [
+        (collector, file)
+        for collector in collectors
+        if (base_folder / collector).exists()
+        for file in (base_folder / collector).iterdir()
+        if file.is_file()
+    ]
+    issue_frames = [
+        sub for sub in map_files(
+            partial(cached_parse, cache_dir, _parse_agg_file),
+            [j[0] for j in jobs], [dayfirst] * len(jobs), [j[1] for j in jobs],
+        )
+        if sub is not None
+    ]
+
+    if not issue_frames:
+        return pd.DataFrame(columns=["collector", "activity", "status", "date", "date_text"])
+
+    issues_df = pd.concat(issue_frames, ignore_index=True)
+    issues_df = issues_df[["collector", "activity", "status", "date", "date_text"]]
+    issues_df = issues_df.sort_values(
+        ["collector", "date"], ascending=[True, False], kind="stable", ignore_index=True
+    )
+    return issues_df.astype({"collector": "category", "activity": "category", "status": "category"})
 
-        for file in collector_path.iterdir():
-            if not file.is_file(): continue
+# =========================================================
+# REPORT: EXCEL
+# =========================================================
 
-            df = read_table(file)
-            if df.empty: continue
+def format_dates(df):
+    """
+    Returns df with its "date" column rendered as text for human-facing outputs.
+    Unparsed dates fall back to the original "date_text", and only rows with
+    no date at all show "Undef. Date".
+    """
+    if "date" not in df.columns or not pd.api.types.is_datetime64_any_dtype(df["date"]):
+        return df
+    fallback = "Undef. Date"
+    if "date_text" in df.columns:
+        fallback = df["date_text"].where(df["date_text"] != "", "Undef. Date")
+    text = df["date"].dt.strftime(DATE_FORMAT).fillna(fallback)
+    return df.assign(date=text).drop(columns="date_text", errors="ignore")
+
+def write_excel_report(path: Path, sheets):
+    """
+    Writes each (sheet_name, df) pair with XlsxWriter in constant_memory mode,
+    which streams rows to disk instead of holding the workbook in memory.
+    Rows must arrive strictly in order, so cells are written row by row here
+    rather than through DataFrame.to_excel (which fills column by column).
+    """
+    import xlsxwriter
 
-            act_col = find_column(df, ["activity type", "activity", "process"])
-            status_col = find_column(df, ["status", "execution status"])
-            date_col = find_column(df, ["start time", "run time", "timestamp", "date"])
+    with xlsxwriter.Workbook(str(path), {"constant_memory": True}) as wb:
+        for name, df in sheets:
+            ws = wb.add_worksheet(name)
+            ws.write_row(0, 0, [str(c) for c in df.columns])
+            for i, row in enumerate(df.itertuples(index=False, name=None), start=1):
+                ws.write_row(i, 0, row)
 
-            if not act_col or not status_col:
-                continue
+def clear_tabular_reports(out: Path):
+    """
+    Removes tables left by a previous run, in any format, so a table that is
+    empty this time (and therefore not written) cannot show stale rows.
+    """
+    stale = [out / EXCEL_REPORT]
+    for name in (TABLE_STAP, TABLE_AGGREGATION):
+        stale += [out / f"{name}.{ext}" for ext in ("parquet", "csv")]
+    for path in stale:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            # e.g. still open in Excel on Windows; not fatal for the rest of the run
+            print(f"⚠ Could not remove previous {path.name}: {e}")
+
+def write_tabular_report(out: Path, sheets, output_format="parquet"):
+    """
+    Writes the inventory/error tables in the requested format. Parquet and CSV
+    produce one file per table; only xlsx builds CM_report.xlsx.
+    """
+    if output_format != "parquet":
+        # Parquet keeps native timestamps (plus date_text); text formats get the report's date format
+        sheets = [(name, format_dates(df)) for name, df in sheets]
+
+    if output_format == "xlsx":
+        path = out / EXCEL_REPORT
+        write_excel_report(path, sheets)
+        print(f"📊 Excel Report generated: {path}")
+        return
 
-            for _, row in df.iterrows():
-                status_val = str(row.get(status_col, "")).strip()
-                activity_val = str(row.get(act_col, "")).strip()
-                
-                date_val = str(row.get(date_col, "")).strip() if date_col else "Undef. Date"
+    if output_format == "parquet":
+        try:
+            for name, df in sheets:
+                df.to_parquet(out / f"{name}.parquet", compression="zstd", index=False)
+            print(f"📊 Parquet tables generated in: {out}")
+            return
+        except ImportError:
+            print("⚠ Parquet output requires pyarrow (pip install pyarrow); writing CSV instead.")
 
-                if not status_val or not activity_val:
-                    continue
+    for name, df in sheets:
+        df.to_csv(out / f"{name}.csv", index=False)
+    print(f"📊 CSV tables generated in: {out}")
 
-                is_success = any(ok_word in status_val.lower() for ok_word in SUCCESS_KEYWORDS)
-                
-                if not is_success:
-                    issues.append({
-                        "collector": collector,
-                        "activity": activity_val,
-                        "status": status_val,
-                        "date": date_val
-                    })
+# =========================================================
+# REPORT: WORD TABLES
+# =========================================================
 
+def _add_table(doc, headers, rows):
+    """
+    Adds a 'Table Grid' table with a header row and appends the data rows as
+    raw XML. python-docx's add_row() gets slower as the table grows, so one
+    blank <w:tr> is cloned per row and filled in directly instead.
+    """
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
+
+    table = doc.add_table(rows=2, cols=len(headers))
+    table.style = 'Table Grid'
+    for cell, text in zip(table.rows[0].cells, headers):
+        cell.text = text
+
+    tbl = table._tbl
+    template = tbl.tr_lst[-1]
+    tbl.remove(template)
+
+    for values in rows:
+        tr = deepcopy(template)
+        for tc, value in zip(tr.tc_lst, values):
+            # CT_R.text applies the same conversion as cell.text ("\n" -> <w:br/>, "\t" -> <w:tab/>)
+            r = OxmlElement("w:r")
+            r.text = value
+            tc.find(qn("w:p")).append(r)
+        tbl.append(tr)
+    return table
+
+def build_inactive_table(doc, df_inactive):
+    return _add_table(
+        doc,
+        ['Host', 'Status', 'Version (Revision)'],
+        df_inactive[["host", "status", "version"]].itertuples(index=False, name=None),
+    )
+
+def build_errors_table(doc, issues_df):
+    rows = format_dates(issues_df)[["collector", "activity", "status", "date"]].itertuples(index=False, name=None)
+    return _add_table(
+        doc,
+        ['Collector / Appliance', 'Failure (Process/Status)', 'Occurrence Date'],
+        ((collector, f"{activity} ({status})", date) for collector, activity, status, date in rows),
+    )
+
+def write_word_report(out: Path, stap_sum, stap_inactive_df, agg_df):
+    """Builds the executive Word report; returns its path, or None without python-docx"""
     try:
-        issues.sort(key=lambda x: (x['collector'], x['date']), reverse=True)
-    except:
-        pass
+        from docx import Document
+    except Exception:
+        # The script still runs without python-docx; only the Word report is skipped
+        print("⚠ python-docx is not installed; skipping the Word report.")
+        return None
+
+    doc = Document()
+    doc.add_heading("Guardium Health Check Report", 0)
+    doc.add_paragraph(f"Generated on: {datetime.now().strftime('%d/%m/%Y %H:%M')}")
+
+    # --- SECTION 1: STAP ---
+    doc.add_heading("1. Agent Status (STAP)", level=1)
+    doc.add_paragraph(f"Total agents detected: {stap_sum['total']}")
+    doc.add_paragraph(f"Active Agents: {stap_sum['active']}")
+    p_inativos = doc.add_paragraph()
+    p_inativos.add_run(f"Inactive Agents: {stap_sum['inactive']}").bold = True
+
+    # Inactive Table
+    if stap_sum['inactive'] > 0:
+        doc.add_heading("Detail of Inactive Agents:", level=3)
+
+        build_inactive_table(doc, stap_inactive_df)
+    else:
+        doc.add_paragraph("✔ All reported agents are active.")
+
+    # --- SECTION 2: AGGREGATION ---
+    doc.add_heading("2. Aggregation Process Failures", level=1)
+    
+    if not agg_df.empty:
+        doc.add_paragraph("The following process failures were detected (Purge, Export, Archive, etc.):")
         
-    return issues
+        build_errors_table(doc, agg_df)
+    else:
+        doc.add_paragraph("No critical errors found in the provided aggregation logs.")
+
+    # Using the Portuguese filename as specified in the README.md output section
+    word_path = out / "Relatorio_Executivo.docx"
+    doc.save(word_path)
+    return word_path
 
 # =========================================================
 # MAIN
 # =========================================================
 
-def main(base_path="."):
+def main(
+    base_path=".", output_format="parquet", write_tables=True, write_word=True, use_cache=True,
+    dayfirst=DATE_DAYFIRST,
+):
     base = Path(base_path).resolve()
     cm = base / "CM"
     
@@ -273,88 +761,70 @@ def main(base_path="."):
 
     # 4. PROCESSING AND ANALYSIS
     print("\n⚙ Processing data...")
-    
+    cache_dir = cm / FOLDER_CACHE if use_cache else None
+
     # A) STAP
-    stap_df, stap_sum = process_stap_status(cm / FOLDER_STAP)
+    stap_df, stap_inactive_df, stap_sum = process_stap_status(cm / FOLDER_STAP, cache_dir)
     
     # B) Aggregation
-    agg_issues = analyze_aggregation_errors(cm / FOLDER_AGGREGATION, collectors)
+    agg_df = analyze_aggregation_errors(cm / FOLDER_AGGREGATION, collectors, cache_dir, dayfirst)
 
     # 5. REPORT GENERATION
     out = cm / FOLDER_OUTPUT
-    out.mkdir(exist_ok=True)
-
-    # Excel Output
-    with pd.ExcelWriter(out / "CM_report.xlsx", engine="openpyxl") as writer:
+    if write_tables or write_word:
+        out.mkdir(exist_ok=True)
+    # Always drop last run's tables, even with --no-tables, so none sit next to a new Word report
+    clear_tabular_reports(out)
+
+    # Tabular Output (Parquet/CSV/Excel)
+    if write_tables:
+        sheets = []
         if not stap_df.empty:
-            stap_df.to_excel(writer, sheet_name="STAP_Inventory", index=False)
-        if agg_issues:
-            pd.DataFrame(agg_issues).to_excel(writer, sheet_name="Aggregation_Errors", index=False)
+            sheets.append((TABLE_STAP, stap_df))
+        if not agg_df.empty:
+            sheets.append((TABLE_AGGREGATION, agg_df))
+        write_tabular_report(out, sheets, output_format)
 
     # Word Output
-    if Document:
-        doc = Document()
-        doc.add_heading("Guardium Health Check Report", 0)
-        doc.add_paragraph(f"Generated on: {datetime.now().strftime('%d/%m/%Y %H:%M')}")
-
-        # --- SECTION 1: STAP ---
-        doc.add_heading("1. Agent Status (STAP)", level=1)
-        doc.add_paragraph(f"Total agents detected: {stap_sum['total']}")
-        doc.add_paragraph(f"Active Agents: {stap_sum['active']}")
-        p_inativos = doc.add_paragraph()
-        p_inativos.add_run(f"Inactive Agents: {stap_sum['inactive']}").bold = True
-
-        # Inactive Table
-        if stap_sum['inactive'] > 0:
-            doc.add_heading("Detail of Inactive Agents:", level=3)
-            
-            inativos_df = stap_df[stap_df["is_active"] == False]
-
-            table = doc.add_table(rows=1, cols=3)
-            table.style = 'Table Grid'
-            hdr_cells = table.rows[0].cells
-            hdr_cells[0].text = 'Host'
-            hdr_cells[1].text = 'Status'
-            hdr_cells[2].text = 'Version (Revision)'
-
-            for _, row in inativos_df.iterrows():
-                row_cells = table.add_row().cells
-                row_cells[0].text = str(row['host'])
-                row_cells[1].text = str(row['status'])
-                row_cells[2].text = str(row['version'])
-        else:
-            doc.add_paragraph("✔ All reported agents are active.")
-
-        # --- SECTION 2: AGGREGATION ---
-        doc.add_heading("2. Aggregation Process Failures", level=1)
-        
-        if agg_issues:
-            doc.add_paragraph("The following process failures were detected (Purge, Export, Archive, etc.):")
-            
-            err_table = doc.add_table(rows=1, cols=3)
-            err_table.style = 'Table Grid'
-            eh_cells = err_table.rows[0].cells
-            eh_cells[0].text = 'Collector / Appliance'
-            eh_cells[1].text = 'Failure (Process/Status)'
-            eh_cells[2].text = 'Occurrence Date'
-
-            for issue in agg_issues:
-                row_cells = err_table.add_row().cells
-                row_cells[0].text = str(issue['collector'])
-                row_cells[1].text = f"{issue['activity']} ({issue['status']})"
-                row_cells[2].text = str(issue['date'])
-        else:
-            doc.add_paragraph("No critical errors found in the provided aggregation logs.")
-
-        # Using the Portuguese filename as specified in the README.md output section
-        word_path = out / "Relatorio_Executivo.docx"
-        doc.save(word_path)
-        print(f"📄 Word Report generated: {word_path}")
+    if write_word:
+        word_path = write_word_report(out, stap_sum, stap_inactive_df, agg_df)
+        if word_path:
+            print(f"📄 Word Report generated: {word_path}")
 
     print("\n✅ PROCESSING COMPLETE")
     print(f"Inactive Agents: {stap_sum['inactive']}")
-    print(f"Aggregation Errors: {len(agg_issues)}")
+    print(f"Aggregation Errors: {len(agg_df)}")
 
 if __name__ == "__main__":
-    arg = sys.argv[1] if len(sys.argv) > 1 else "."
-    main(arg)
+    parser = argparse.ArgumentParser(description="Guardium CM Processor — Complete Health Check")
+    parser.add_argument("base_path", nargs="?", default=".", help="Folder where the CM/ working directory lives")
+    parser.add_argument(
+        "--format", dest="output_format", choices=OUTPUT_FORMATS, default="parquet",
+        help="Format of the inventory/error tables (default: parquet)",
+    )
+    parser.add_argument(
+        "--no-tables", "--no-excel", dest="no_tables", action="store_true",
+        help="Skip the inventory/error tables (Parquet/CSV/Excel)",
+    )
+    parser.add_argument("--no-word", action="store_true", help="Skip the Word report")
+    parser.add_argument(
+        "--summary-only", action="store_true",
+        help="Only print the summary counts (implies --no-tables and --no-word)",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help=f"Re-parse every file instead of reusing results cached in CM/{FOLDER_CACHE}",
+    )
+    parser.add_argument(
+        "--month-first", action="store_true",
+        help="Read ambiguous aggregation dates such as 01/02/2024 as mm/dd instead of dd/mm",
+    )
+    args = parser.parse_args()
+    main(
+        args.base_path,
+        output_format=args.output_format,
+        write_tables=not (args.no_tables or args.summary_only),
+        write_word=not (args.no_word or args.summary_only),
+        use_cache=not args.no_cache,
+        dayfirst=not args.month_first,
+    )